@@ -12,5 +12,5 @@ from trading_script import main
 if __name__ == "__main__":
 
     data_dir = Path(__file__).resolve().parent
-    main("Start Your Own/chatgpt_portfolio_update.csv", Path("Start Your Own"))
+    main(str(data_dir / "chatgpt_portfolio_update.csv"), data_dir)
 
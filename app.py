@@ -1,4 +1,14 @@
+# Cooperative I/O: when eventlet is available, patch the stdlib before anything else imports it
+# so slow market-data/OpenAI calls don't block other requests and Socket.IO heartbeats.
+try:
+    import eventlet
+    eventlet.monkey_patch()
+    _ASYNC_MODE = 'eventlet'
+except ImportError:
+    _ASYNC_MODE = 'threading'
+
 from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import json as flask_json
 from flask_socketio import SocketIO, emit
 import threading
 import time
@@ -9,52 +19,116 @@ from datetime import datetime, timedelta
 import logging
 from pathlib import Path
 import queue
-import traceback
+import re
 from datetime import time as dt_time
 import pytz
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from dotenv import load_dotenv
 import functools
+import copy
+import dataclasses
+from dataclasses import dataclass, asdict
+from uuid import uuid4
 import os as _os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 try:
     from openai import OpenAI
 except Exception:
     OpenAI = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+from typing import Annotated, Optional
+from pydantic import BaseModel, BeforeValidator, StringConstraints, TypeAdapter, ValidationError
+from flask.json.provider import DefaultJSONProvider
 
 # Import your trading script functions
 from trading_script import (
-    process_portfolio, daily_results, load_latest_portfolio_state,
+    process_portfolio, performance_metrics, load_latest_portfolio_state,
     set_data_dir, set_asof, main as trading_main,
-    auto_trade_once,
+    auto_trade_once, download_price_data, price_data_cache, run_in_context, trading_day_window,
+    atomic_write_bytes,
 )
 
 load_dotenv()  # load .env if present
 
+# Resolve file locations once at import instead of per request
+SCRIPT_DIR = Path(__file__).resolve().parent
+DATA_DIR = SCRIPT_DIR
+PORTFOLIO_CSV = DATA_DIR / "chatgpt_portfolio_update.csv"
+AUTOTRADE_JSON = SCRIPT_DIR / "autotrade.json"
+TICKERS_JSON = SCRIPT_DIR / "tickers.json"
+SETTINGS_JSON = SCRIPT_DIR / "settings.json"
+set_data_dir(DATA_DIR)
+
+_is_ticker = re.compile(r"\^?[A-Z0-9.=\-]+").fullmatch  # SPY, BRK.B, ^GSPC, ES=F, EURUSD=X; bound once for the sanitize loop
+
+# .env is loaded exactly once above; snapshot the settings derived from it rather than re-reading per request
+_ENV_SETTINGS = {
+    'STARTING_CASH': os.getenv('STARTING_CASH', '10000'),
+    'SCHED_INTERVAL_MINUTES': os.getenv('SCHED_INTERVAL_MINUTES', '15'),
+    'SCHED_MARKET_HOURS_ONLY': os.getenv('SCHED_MARKET_HOURS_ONLY', 'true'),
+    'DEBUG': os.getenv('DEBUG', 'false'),
+}
+STARTING_CASH = float(_ENV_SETTINGS['STARTING_CASH'])
+SCHED_INTERVAL_MINUTES = int(_ENV_SETTINGS['SCHED_INTERVAL_MINUTES'])
+SCHED_MARKET_HOURS_ONLY = _ENV_SETTINGS['SCHED_MARKET_HOURS_ONLY'].lower() == 'true'
+DEBUG = _ENV_SETTINGS['DEBUG'].lower() == 'true'
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-change-me')
-socketio = SocketIO(app, cors_allowed_origins="*")
-ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'changeme')
+if orjson is not None:
+    class ORJSONProvider(DefaultJSONProvider):
+        """Serve jsonify/get_json through orjson; unknown types fall back to Flask's default."""
 
-# Global variables for trading state
-trading_status = {
-    'is_running': False,
-    'last_update': None,
-    'current_portfolio': None,
-    'cash_balance': 0.0,
-    'total_equity': 0.0,
-    'daily_pnl': 0.0,
-    'max_drawdown': 0.0,
-    'sharpe_ratio': 0.0,
-    'error': None
-}
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(
+                obj, default=self.default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            ).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = ORJSONProvider(app)
+# Encode Socket.IO packets through app.json too, so portfolio/status pushes use orjson instead of stdlib json
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=_ASYNC_MODE, json=flask_json)
+ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'changeme')
 
-scheduler = BackgroundScheduler(timezone=pytz.timezone('US/Eastern'))
+# Global trading state: an immutable snapshot, replaced wholesale on every change
+@dataclass(frozen=True)
+class TradingStatus:
+    is_running: bool = False
+    last_update: str | None = None
+    current_portfolio: list | None = None
+    cash_balance: float = 0.0
+    total_equity: float = 0.0
+    daily_pnl: float = 0.0
+    max_drawdown: float = 0.0
+    sharpe_ratio: float = 0.0
+    error: str | None = None
+
+_state = TradingStatus()
+_state_lock = threading.Lock()
+
+def _set_status(**changes) -> TradingStatus:
+    """Publish a new status snapshot; the single reference swap means readers never see a partial update.
+
+    Writers serialize on _state_lock so concurrent read-replace-assign updates don't drop each other's fields.
+    """
+    global _state
+    with _state_lock:
+        _state = dataclasses.replace(_state, **changes)
+        return _state
+
+_EASTERN = pytz.timezone('US/Eastern')
+scheduler = BackgroundScheduler(timezone=_EASTERN)
 autotrade_job_id = 'autotrade_job'
 autotrade_schedule = {
     'enabled': False,
-    'interval_minutes': int(os.getenv('SCHED_INTERVAL_MINUTES', '15')),
-    'market_hours_only': os.getenv('SCHED_MARKET_HOURS_ONLY', 'true').lower() == 'true',
+    'interval_minutes': SCHED_INTERVAL_MINUTES,
+    'market_hours_only': SCHED_MARKET_HOURS_ONLY,
 }
 
 # Queue for communication between trading thread and web UI
@@ -73,19 +147,48 @@ DEFAULT_AUTOTRADE = {
     "prompt": "",
 }
 
+# Parsed JSON files keyed by path -> ((mtime_ns, size), data)
+_JSON_CACHE = {}
+
+def _read_json_cached(p: Path):
+    """Load JSON from `p`, re-parsing only when the file's mtime/size change.
+
+    Returns None if the file does not exist; raises on malformed JSON.
+    """
+    try:
+        st = p.stat()
+    except FileNotFoundError:
+        _JSON_CACHE.pop(p, None)
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    hit = _JSON_CACHE.get(p)
+    if hit is None or hit[0] != key:
+        raw = p.read_bytes()
+        hit = _JSON_CACHE[p] = (key, orjson.loads(raw) if orjson is not None else json.loads(raw))
+    data = hit[1]
+    return data.copy() if isinstance(data, (dict, list)) else data
+
+def _write_json_file(p: Path, data) -> None:
+    """Atomically write `data` to `p` as indented JSON (orjson when available).
+
+    Published via atomic_write_bytes, so _read_json_cached never sees a partial file.
+    """
+    if orjson is not None:
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    else:
+        payload = json.dumps(data, indent=2).encode('utf-8')
+    atomic_write_bytes(p, payload)
+
 def _autotrade_path() -> Path:
-    return Path(__file__).resolve().parent / "autotrade.json"
+    return AUTOTRADE_JSON
 
 def read_autotrade_config() -> dict:
-    p = _autotrade_path()
     try:
-        if p.exists():
-            with p.open("r", encoding="utf-8") as fh:
-                data = json.load(fh)
-                if isinstance(data, dict):
-                    cfg = DEFAULT_AUTOTRADE.copy()
-                    cfg.update(data)
-                    return cfg
+        data = _read_json_cached(_autotrade_path())
+        if isinstance(data, dict):
+            cfg = DEFAULT_AUTOTRADE.copy()
+            cfg.update(data)
+            return cfg
     except Exception:
         pass
     return DEFAULT_AUTOTRADE.copy()
@@ -93,22 +196,109 @@ def read_autotrade_config() -> dict:
 def write_autotrade_config(cfg: dict) -> None:
     p = _autotrade_path()
     try:
-        with p.open("w", encoding="utf-8") as fh:
-            json.dump(cfg, fh, indent=2)
+        _write_json_file(p, cfg)
     except Exception as e:
         logger.error("Failed to write autotrade.json: %s", e)
 
+# ---- Concurrent price lookups ----
+# Shared pool for I/O-bound per-ticker downloads; the underlying urllib3 pools are thread-safe
+_FETCH_POOL = ThreadPoolExecutor(max_workers=8)
+
+def _fetch_brief(ticker, start, end):
+    """Return (ticker, close, volume) from the latest bar, or None if no data."""
+    try:
+        df = download_price_data(ticker, start=start, end=end, progress=False).df
+        if df.empty:
+            return None
+        return ticker, float(df['Close'].iloc[-1]), float(df['Volume'].iloc[-1])
+    except Exception:
+        return None
+
+def _prefetch_day_bars(tickers):
+    """Download today's bars for `tickers` concurrently; pair with price_data_cache() so order fills reuse them."""
+    s, e = trading_day_window()
+    fetch = lambda t: download_price_data(t, start=s, end=e, auto_adjust=False, progress=False)
+    list(_FETCH_POOL.map(run_in_context(fetch), [t for t in dict.fromkeys(tickers) if t]))
+
+def _prefetch_closes(closes, tickers, start, end):
+    """Fill `closes` for any tickers it is missing, downloading them concurrently.
+
+    Tickers that can't be priced are stored as None, so they are never downloaded again this pass.
+    """
+    misses = [t for t in dict.fromkeys(tickers) if t and t not in closes]
+    for t, res in zip(misses, _FETCH_POOL.map(lambda t: _fetch_brief(t, start, end), misses)):
+        closes[t] = None if res is None else (res[1], res[2])
+    return closes
+
+def _total_equity(portfolio, cash) -> float:
+    """Cash plus shares * buy_price summed over a portfolio DataFrame (or list of dicts)."""
+    df = portfolio if isinstance(portfolio, pd.DataFrame) else pd.DataFrame(portfolio or [])
+    if df.empty or 'shares' not in df.columns or 'buy_price' not in df.columns:
+        return float(cash)
+    shares = pd.to_numeric(df['shares'], errors='coerce').fillna(0)
+    price = pd.to_numeric(df['buy_price'], errors='coerce').fillna(0)
+    return float((shares * price).sum()) + float(cash)
+
+def _push_portfolio_update(portfolio, cash, total_equity):
+    """Push fresh portfolio state to connected dashboards so they don't need to poll."""
+    socketio.emit('portfolio_update', {
+        'portfolio': portfolio,
+        'cash': cash,
+        'total_equity': total_equity,
+        'last_update': datetime.now().isoformat(),
+    })
+
+# Parsed portfolio CSV views, refreshed only when the file changes
+_PORTFOLIO_CACHE = {'key': None, 'history': None, 'state': None}
+_HISTORY_COLS = ['Date', 'Ticker', 'Total Equity', 'Cash Balance', 'PnL']
+_HISTORY_DTYPES = {'Ticker': 'category'}  # numeric columns hold blank cells; _build_history coerces them
+
+def _build_history(df):
+    totals = df.loc[df["Ticker"].values == "TOTAL"]
+    if totals.empty:
+        return []
+
+    totals = totals.assign(Date=pd.to_datetime(totals["Date"])).sort_values("Date", kind="mergesort")
+    history = pd.DataFrame({
+        'date': totals['Date'].dt.strftime('%Y-%m-%d'),
+        'equity': pd.to_numeric(totals['Total Equity'], errors='coerce').fillna(0.0),
+        'cash': pd.to_numeric(totals['Cash Balance'], errors='coerce').fillna(0.0),
+        'pnl': pd.to_numeric(totals['PnL'], errors='coerce').fillna(0.0),
+    })
+    return history.to_dict('records')
+
+def _read_history(portfolio_csv: Path):
+    df = pd.read_csv(portfolio_csv, engine='c', usecols=_HISTORY_COLS, dtype=_HISTORY_DTYPES)
+    return _build_history(df)
+
+def _read_state(portfolio_csv: Path):
+    return load_latest_portfolio_state(str(portfolio_csv))
+
+def _cached_view(portfolio_csv: Path, name: str, build):
+    """Return view `name` of `portfolio_csv`, re-reading it only when mtime/size change.
+
+    Each view is built on its own, so a problem in one (e.g. a bad Date cell in the history
+    columns) doesn't take the other down with it.
+    """
+    st = portfolio_csv.stat()
+    key = (str(portfolio_csv), st.st_mtime_ns, st.st_size)
+    if _PORTFOLIO_CACHE['key'] != key:
+        _PORTFOLIO_CACHE.update(key=key, history=None, state=None)
+    view = _PORTFOLIO_CACHE[name]
+    if view is None:
+        view = _PORTFOLIO_CACHE[name] = build(portfolio_csv)
+    return view
+
 def get_portfolio_data():
     """Get current portfolio data for display"""
     try:
-        script_dir = Path(__file__).resolve().parent
-        portfolio_csv = script_dir / "chatgpt_portfolio_update.csv"
+        portfolio_csv = PORTFOLIO_CSV
         
         if not portfolio_csv.exists():
             return None, 0.0
-            
-        portfolio, cash = load_latest_portfolio_state(str(portfolio_csv))
-        return portfolio, cash
+
+        portfolio, cash = _cached_view(portfolio_csv, 'state', _read_state)
+        return copy.deepcopy(portfolio), cash
     except Exception as e:
         logger.error(f"Error loading portfolio: {e}")
         return None, 0.0
@@ -116,31 +306,12 @@ def get_portfolio_data():
 def get_trading_history():
     """Get trading history for charts"""
     try:
-        script_dir = Path(__file__).resolve().parent
-        portfolio_csv = script_dir / "chatgpt_portfolio_update.csv"
+        portfolio_csv = PORTFOLIO_CSV
         
         if not portfolio_csv.exists():
             return []
-            
-        df = pd.read_csv(portfolio_csv)
-        totals = df[df["Ticker"] == "TOTAL"].copy()
-        
-        if totals.empty:
-            return []
-            
-        totals["Date"] = pd.to_datetime(totals["Date"])
-        totals = totals.sort_values("Date")
-        
-        history = []
-        for _, row in totals.iterrows():
-            history.append({
-                'date': row['Date'].strftime('%Y-%m-%d'),
-                'equity': float(row['Total Equity']) if pd.notna(row['Total Equity']) else 0.0,
-                'cash': float(row['Cash Balance']) if pd.notna(row['Cash Balance']) else 0.0,
-                'pnl': float(row['PnL']) if pd.notna(row['PnL']) else 0.0
-            })
-        
-        return history
+
+        return list(_cached_view(portfolio_csv, 'history', _read_history))
     except Exception as e:
         logger.error(f"Error loading trading history: {e}")
         return []
@@ -171,9 +342,13 @@ def autotrade_config():
         if 'universe' in incoming:
             uni = incoming['universe']
             if isinstance(uni, str):
-                uni = [t.strip().upper() for t in uni.split(',') if t.strip()]
-            elif isinstance(uni, list):
-                uni = [str(t).strip().upper() for t in uni if str(t).strip()]
+                uni = uni.split(',')
+            if isinstance(uni, list):
+                # normalize each entry once and drop blanks; anything else must be ticker-shaped
+                uni = [u for u in (str(t).strip().upper() for t in uni) if u]
+                invalid = [u for u in uni if not _is_ticker(u)]
+                if invalid:
+                    return jsonify({"status": "error", "message": f"Invalid tickers in universe: {', '.join(invalid)}"}), 400
             else:
                 uni = cfg['universe']
             cfg['universe'] = uni
@@ -186,6 +361,7 @@ def autotrade_config():
         if 'prompt' in incoming:
             cfg['prompt'] = str(incoming['prompt'] or '')
         write_autotrade_config(cfg)
+        socketio.start_background_task(socketio.emit, 'autotrade_config', cfg)
         return jsonify({"status": "success", "config": cfg})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 400
@@ -195,26 +371,24 @@ def autotrade_config():
 def autotrade_run():
     """Run one auto-trading pass: evaluate rules and place buys if criteria met."""
     try:
-        script_dir = Path(__file__).resolve().parent
-        set_data_dir(script_dir)
-
-        portfolio_csv = script_dir / "chatgpt_portfolio_update.csv"
+        portfolio_csv = PORTFOLIO_CSV
         if portfolio_csv.exists():
             portfolio, cash = load_latest_portfolio_state(str(portfolio_csv))
         else:
             portfolio = pd.DataFrame(columns=["ticker", "shares", "stop_loss", "buy_price", "cost_basis"])
-            cash = float(os.environ.get('STARTING_CASH', '10000'))
+            cash = STARTING_CASH
 
         # Run auto-buyer
-        portfolio_df, cash, executed = auto_trade_once(portfolio, cash, base_dir=script_dir)
+        portfolio_df, cash, executed = auto_trade_once(portfolio, cash, base_dir=SCRIPT_DIR)
 
         # Price and persist results
         portfolio_df, cash = process_portfolio(portfolio_df, cash, interactive=False)
 
         # Prepare response
         current_portfolio = portfolio_df.to_dict('records')
-        total_value = sum(float(s.get('shares', 0)) * float(s.get('buy_price', 0)) for s in current_portfolio)
-        total_equity = total_value + cash
+        total_equity = _total_equity(portfolio_df, cash)
+        # Broadcast off the request path so the caller's response isn't held up by the fan-out
+        socketio.start_background_task(_push_portfolio_update, current_portfolio, cash, total_equity)
 
         return jsonify({
             "status": "success",
@@ -227,106 +401,188 @@ def autotrade_run():
         logger.exception("Auto-trade failed")
         return jsonify({"status": "error", "message": str(e)}), 500
 
-@app.route('/autotrade/ai_run', methods=['POST'])
-@login_required
-def autotrade_ai_run():
-    """Use an LLM to decide daily buys/sells based on user's prompt and recent data."""
-    try:
-        script_dir = Path(__file__).resolve().parent
-        set_data_dir(script_dir)
+# ---- OpenAI client (long-lived so its connection pool is reused across runs) ----
+_AI_SYSTEM_MSG = (
+    'You are a trading assistant. Return ONLY strict JSON with keys "buy" and "sell". '
+    'Format: {"buy":[{"ticker":"SPY","percent":0.2,"stop":0.1}],"sell":["IWM"]}. '
+    'Percents must sum to <= 1.0. Use only tickers provided. '
+    '"market" is CSV with header ticker,close,volume.'
+)
+_OPENAI_CLIENT = None
 
-        cfg = read_autotrade_config()
-        prompt = cfg.get('prompt') or ''
-        universe = cfg.get('universe') or []
-        if not prompt or not universe:
-            return jsonify({'status': 'error', 'message': 'Set prompt and universe first in Auto-Trading.'}), 400
-
-        # Build simple context (latest close/volume for each ticker)
-        from trading_script import download_price_data, last_trading_date
-        end_d = last_trading_date()
-        start_d = end_d - pd.Timedelta(days=5)
-        briefs = []
-        for t in universe:
+# The AI plan is parsed and validated in one pass by a TypeAdapter built once at import.
+# Like the old hand-rolled parsing, it is lenient: nulls fall back to the field default and a
+# malformed buy/sell entry is dropped on its own instead of discarding the whole plan.
+_Ticker = Annotated[str, StringConstraints(strip_whitespace=True, to_upper=True)]
+
+def _null_to(default):
+    return BeforeValidator(lambda v: default if v is None else v)
+
+class _AIBuy(BaseModel):
+    ticker: Annotated[Optional[_Ticker], _null_to('')] = ''
+    percent: Annotated[Optional[float], _null_to(0.0)] = 0.0
+    stop: Annotated[Optional[float], _null_to(0.0)] = 0.0
+
+def _valid_items(adapter):
+    """Before-validator keeping only the list items `adapter` accepts (null -> empty list)."""
+    def keep(items):
+        if items is None:
+            return []
+        if not isinstance(items, list):
+            return items  # let the list type reject it
+        out = []
+        for item in items:
             try:
-                df = download_price_data(str(t).upper(), start=start_d, end=end_d + pd.Timedelta(days=1), progress=False).df
-                if df.empty:
-                    continue
-                close = float(df['Close'].iloc[-1])
-                vol = float(df['Volume'].iloc[-1])
-                briefs.append({'ticker': str(t).upper(), 'close': close, 'volume': int(vol)})
-            except Exception:
+                out.append(adapter.validate_python(item))
+            except ValidationError:
                 continue
+        return out
+    return BeforeValidator(keep)
+
+class _AIPlan(BaseModel):
+    buy: Annotated[Optional[list[_AIBuy]], _valid_items(TypeAdapter(_AIBuy))] = []
+    sell: Annotated[Optional[list[_Ticker]], _valid_items(TypeAdapter(_Ticker))] = []
+
+_AI_PLAN_ADAPTER = TypeAdapter(_AIPlan)
+
+def _get_openai():
+    global _OPENAI_CLIENT
+    if _OPENAI_CLIENT is None:
+        # The SDK retries timeouts, 429s and 5xx with exponential backoff
+        _OPENAI_CLIENT = OpenAI(max_retries=3, timeout=60.0)
+    return _OPENAI_CLIENT
+
+# Optional hedging of slow completions (off unless AI_HEDGE_MS > 0): if no reply arrives within
+# AI_HEDGE_MS, an identical request is fired and the first success wins. A hedge that fires is a
+# second billed completion. Attempts run on their own small pool so they never take _FETCH_POOL
+# slots from price fetches.
+_AI_HEDGE_S = float(os.getenv('AI_HEDGE_MS', '0')) / 1000.0
+_AI_HEDGE_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ai-hedge') if _AI_HEDGE_S > 0 else None
+
+def _hedged_call(create):
+    """Run `create(client)`, hedging it with a duplicate request when AI_HEDGE_MS is set.
+
+    Both attempts share the pooled client. A request already in flight can't be aborted from
+    another thread, so the losing attempt runs on until it answers or hits the client timeout;
+    attempts skip the SDK's own retries (the hedge is the retry), which bounds that to one timeout.
+    """
+    if _AI_HEDGE_POOL is None:
+        return create(_get_openai())
+
+    client = _get_openai().with_options(max_retries=0)
+    futures = [_AI_HEDGE_POOL.submit(create, client)]
+    try:
+        done, _ = wait(futures, timeout=_AI_HEDGE_S)
+        if done:
+            return futures[0].result()
+        futures.append(_AI_HEDGE_POOL.submit(create, client))
+        pending = set(futures)
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    return f.result()
+            if not pending:
+                return done.pop().result()  # both attempts failed: raise the last error
+    finally:
+        for f in futures:
+            f.cancel()  # only stops an attempt that hasn't started yet
+
+def _load_current_state():
+    """Return (portfolio DataFrame, cash) from the latest portfolio CSV, or an empty book."""
+    if PORTFOLIO_CSV.exists():
+        portfolio, cash = load_latest_portfolio_state(str(PORTFOLIO_CSV))
+        df = pd.DataFrame(portfolio) if isinstance(portfolio, list) else portfolio.copy()
+        return df, cash
+    return pd.DataFrame(columns=["ticker", "shares", "stop_loss", "buy_price", "cost_basis"]), STARTING_CASH
+
+def _run_ai_autotrade(cfg):
+    """One AI auto-trade pass: price the universe, ask the LLM for a plan, execute it and persist."""
+    prompt = cfg.get('prompt') or ''
+    universe = cfg.get('universe') or []
+
+    # Build simple context (latest close/volume for each ticker)
+    from trading_script import download_latest_closes, last_trading_date
+    end_d = last_trading_date()
+    start_d = end_d - pd.Timedelta(days=5)
+    window_end = end_d + pd.Timedelta(days=1)
+    tickers = [str(t).upper() for t in universe]
+    # One batched request for the whole universe; reused by the sell/buy legs below.
+    # Anything the batch missed is fetched concurrently, once; unpriceable tickers are cached as None.
+    closes = download_latest_closes(tickers, start=start_d, end=window_end)
+    _prefetch_closes(closes, tickers, start_d, window_end)
+
+    # Market context as compact CSV rows instead of a JSON object per ticker (fewer prompt tokens)
+    briefs = 'ticker,close,volume\n' + '\n'.join(
+        f'{t},{round(closes[t][0], 4)},{int(closes[t][1])}' for t in tickers if closes.get(t) is not None
+    )
+
+    # 'market' already lists every tradable universe ticker; only name the ones it had to leave out
+    user_msg = {'prompt': prompt, 'market': briefs}
+    no_data = [t for t in tickers if closes.get(t) is None]
+    if no_data:
+        user_msg['no_data'] = no_data
+    messages = [
+        {'role': 'system', 'content': _AI_SYSTEM_MSG},
+        {'role': 'user', 'content': orjson.dumps(user_msg).decode() if orjson is not None else json.dumps(user_msg)},
+    ]
+    resp = _hedged_call(lambda client: client.chat.completions.create(
+        model='gpt-4o-mini',
+        messages=messages,
+        temperature=0.2,
+        response_format={'type': 'json_object'},
+    ))
+    content = resp.choices[0].message.content if resp and resp.choices else '{}'
+    try:
+        plan = _AI_PLAN_ADAPTER.validate_json(content or '{}')
+    except ValidationError:
+        return {'status': 'error', 'message': 'AI did not return a valid plan.'}
 
-        if OpenAI is None or not _os.getenv('OPENAI_API_KEY'):
-            return jsonify({'status': 'error', 'message': 'OPENAI_API_KEY not set; cannot run AI. Configure it in .env.'}), 400
+    # Read the book only now, after the (multi-second) completion, so fills use today's latest rows
+    df, cash = _load_current_state()
 
-        client = OpenAI()
-        system_msg = (
-            'You are a trading assistant. Return ONLY strict JSON with keys "buy" and "sell". '
-            'Format: {"buy":[{"ticker":"SPY","percent":0.2,"stop":0.1}],"sell":["IWM"]}. '
-            'Percents must sum to <= 1.0. Use only tickers provided.'
-        )
-        user_msg = {
-            'prompt': prompt,
-            'universe': universe,
-            'market': briefs,
-        }
-        resp = client.chat.completions.create(
-            model='gpt-4o-mini',
-            messages=[
-                {'role': 'system', 'content': system_msg},
-                {'role': 'user', 'content': json.dumps(user_msg)},
-            ],
-            temperature=0.2,
-        )
-        content = resp.choices[0].message.content if resp and resp.choices else '{}'
-        try:
-            plan = json.loads(content)
-        except Exception:
-            return jsonify({'status': 'error', 'message': 'AI did not return valid JSON.'}), 500
+    # Price any plan tickers outside the universe up front, concurrently
+    plan_tickers = plan.sell + [b.ticker for b in plan.buy]
+    _prefetch_closes(closes, plan_tickers, start_d, window_end)
 
-        # Load current state
-        portfolio_csv = script_dir / 'chatgpt_portfolio_update.csv'
-        if portfolio_csv.exists():
-            portfolio, cash = load_latest_portfolio_state(str(portfolio_csv))
-            df = pd.DataFrame(portfolio) if isinstance(portfolio, list) else portfolio.copy()
-        else:
-            df = pd.DataFrame(columns=["ticker", "shares", "stop_loss", "buy_price", "cost_basis"])
-            cash = float(os.environ.get('STARTING_CASH', '10000'))
-
-        # Execute sells
-        for t in (plan.get('sell') or []):
-            tkr = str(t).upper()
-            row = df.loc[df.get('ticker').astype(str).str.upper() == tkr]
-            if row.empty:
+    # Fills and the final pricing pass each look up today's bar; fetch them all at once up front
+    held = df['ticker'].astype(str).str.upper().tolist() if 'ticker' in df.columns else []
+    with price_data_cache():
+        _prefetch_day_bars([t for t in plan_tickers if closes.get(t) is not None] + held)
+
+        # Execute sells (ticker -> row label map built once instead of scanning per sell)
+        tkr_to_idx = (
+            dict(zip(df['ticker'].astype(str).str.upper(), df.index)) if 'ticker' in df.columns else {}
+        )
+        for tkr in plan.sell:
+            idx = tkr_to_idx.pop(tkr, None)
+            if idx is None or idx not in df.index:
                 continue
-            shares = float(row.iloc[0].get('shares', 0))
+            shares = float(df.at[idx, 'shares'])
             if shares <= 0:
                 continue
             # price using latest close
             try:
-                s = download_price_data(tkr, start=start_d, end=end_d + pd.Timedelta(days=1), progress=False).df
-                if s.empty:
+                hit = closes.get(tkr)
+                if hit is None:
                     continue
-                px = float(s['Close'].iloc[-1])
+                px = hit[0]
                 from trading_script import log_manual_sell
                 cash, df = log_manual_sell(px, shares, tkr, cash, df, reason='AI SELL', interactive=False)
             except Exception:
                 continue
 
         # Execute buys
-        for b in (plan.get('buy') or []):
+        for b in plan.buy:
             try:
-                tkr = str(b.get('ticker', '')).upper()
-                pct = float(b.get('percent', 0))
-                stop = float(b.get('stop', 0))
+                tkr, pct, stop = b.ticker, b.percent, b.stop
                 if not tkr or pct <= 0 or pct > 1:
                     continue
                 # get latest close
-                s = download_price_data(tkr, start=start_d, end=end_d + pd.Timedelta(days=1), progress=False).df
-                if s.empty:
+                hit = closes.get(tkr)
+                if hit is None:
                     continue
-                px = float(s['Close'].iloc[-1])
+                px = hit[0]
                 budget = cash * pct
                 shares = int(budget // px)
                 if shares < 1:
@@ -338,24 +594,53 @@ def autotrade_ai_run():
 
         # Price and persist
         df, cash = process_portfolio(df, cash, interactive=False)
-        current_portfolio = df.to_dict('records')
-        total_value = sum(float(s.get('shares', 0)) * float(s.get('buy_price', 0)) for s in current_portfolio)
-        total_equity = total_value + cash
+    current_portfolio = df.to_dict('records')
+    total_equity = _total_equity(df, cash)
+    _push_portfolio_update(current_portfolio, cash, total_equity)
 
-        return jsonify({'status': 'success', 'plan': plan, 'portfolio': current_portfolio, 'cash': cash, 'total_equity': total_equity})
-    except Exception as e:
-        logger.exception('AI autotrade failed')
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+    return {'status': 'success', 'plan': plan.model_dump(), 'portfolio': current_portfolio, 'cash': cash, 'total_equity': total_equity}
+
+# ---- Background AI job queue ----
+# /autotrade/ai_run only enqueues; a single worker runs passes in order and reports over Socket.IO.
+_AI_JOB_Q = queue.Queue()
+
+def _ai_job_worker():
+    while True:
+        job_id, cfg = _AI_JOB_Q.get()
+        try:
+            result = _run_ai_autotrade(cfg)
+        except Exception as e:
+            logger.exception('AI autotrade failed')
+            result = {'status': 'error', 'message': str(e)}
+        finally:
+            _AI_JOB_Q.task_done()
+        socketio.emit('ai_run_done', {'job_id': job_id, **result})
+
+threading.Thread(target=_ai_job_worker, name='ai-autotrade-worker', daemon=True).start()
+
+@app.route('/autotrade/ai_run', methods=['POST'])
+@login_required
+def autotrade_ai_run():
+    """Queue an LLM-driven buy/sell pass; the result arrives as an 'ai_run_done' Socket.IO event."""
+    cfg = read_autotrade_config()
+    if not (cfg.get('prompt') or '') or not (cfg.get('universe') or []):
+        return jsonify({'status': 'error', 'message': 'Set prompt and universe first in Auto-Trading.'}), 400
+    if OpenAI is None or not _os.getenv('OPENAI_API_KEY'):
+        return jsonify({'status': 'error', 'message': 'OPENAI_API_KEY not set; cannot run AI. Configure it in .env.'}), 400
+
+    job_id = uuid4().hex
+    _AI_JOB_Q.put((job_id, cfg))
+    return jsonify({'status': 'queued', 'job_id': job_id}), 202
+
+_MKT_OPEN = dt_time(9, 30)
+_MKT_CLOSE = dt_time(16, 0)
 
 def _within_market_hours(now_et=None):
-    tz = pytz.timezone('US/Eastern')
-    now = now_et or datetime.now(tz)
+    now = now_et or datetime.now(_EASTERN)
     # Monday-Friday, 9:30-16:00 ET
     if now.weekday() > 4:
         return False
-    start = now.replace(hour=9, minute=30, second=0, microsecond=0)
-    end = now.replace(hour=16, minute=0, second=0, microsecond=0)
-    return start <= now <= end
+    return _MKT_OPEN <= now.time() <= _MKT_CLOSE
 
 def _autotrade_job():
     try:
@@ -388,7 +673,11 @@ def autotrade_schedule_api():
         job.remove()
 
     if enabled:
-        scheduler.add_job(_autotrade_job, 'interval', minutes=max(1, interval), id=autotrade_job_id, replace_existing=True)
+        # One run at a time; ticks missed while a slow run is in flight collapse into one
+        scheduler.add_job(
+            _autotrade_job, 'interval', minutes=max(1, interval), id=autotrade_job_id, replace_existing=True,
+            max_instances=1, coalesce=True, misfire_grace_time=30,
+        )
         if not scheduler.running:
             scheduler.start()
 
@@ -396,73 +685,46 @@ def autotrade_schedule_api():
 
 def automated_trading_worker():
     """Background worker for automated trading"""
-    global trading_status
-    
     try:
-        trading_status['is_running'] = True
-        trading_status['error'] = None
-        
-        # Set data directory to script location
-        script_dir = Path(__file__).resolve().parent
-        set_data_dir(script_dir)
+        _set_status(is_running=True, error=None)
         
         # Load current portfolio state
-        portfolio_csv = script_dir / "chatgpt_portfolio_update.csv"
+        portfolio_csv = PORTFOLIO_CSV
         
         if not portfolio_csv.exists():
             # Create initial portfolio if none exists
             portfolio = pd.DataFrame(columns=["ticker", "shares", "stop_loss", "buy_price", "cost_basis"])
-            cash = float(os.getenv('STARTING_CASH', '10000'))
-            trading_status['current_portfolio'] = portfolio.to_dict('records')
-            trading_status['cash_balance'] = cash
-            trading_status['total_equity'] = cash
+            cash = STARTING_CASH
         else:
             portfolio, cash = load_latest_portfolio_state(str(portfolio_csv))
-            trading_status['current_portfolio'] = portfolio if isinstance(portfolio, list) else portfolio.to_dict('records')
-            trading_status['cash_balance'] = cash
-            trading_status['total_equity'] = cash
-        
-        # Process portfolio (non-interactive mode)
-        portfolio_df = pd.DataFrame(trading_status['current_portfolio']) if trading_status['current_portfolio'] else pd.DataFrame()
-        portfolio_df, cash = process_portfolio(portfolio_df, cash, interactive=False)
-        
-        # Update status
-        trading_status['current_portfolio'] = portfolio_df.to_dict('records')
-        trading_status['cash_balance'] = cash
+        _set_status(cash_balance=cash, total_equity=cash)
         
-        # Calculate total equity
-        total_value = sum(float(stock.get('shares', 0)) * float(stock.get('buy_price', 0)) for stock in trading_status['current_portfolio'])
-        trading_status['total_equity'] = total_value + cash
+        # Process portfolio (non-interactive mode); keep it a DataFrame until the emit boundary
+        portfolio_df, cash = process_portfolio(portfolio, cash, interactive=False)
         
-        # Get daily results for metrics
+        # Headline metrics straight from the CSV history (no stdout capture or price downloads)
         try:
-            # Capture daily_results output for metrics
-            import io
-            from contextlib import redirect_stdout
-            
-            output = io.StringIO()
-            with redirect_stdout(output):
-                daily_results(portfolio_df, cash)
-            
-            # Parse metrics from output (simplified)
-            trading_status['daily_pnl'] = 0.0  # Will be calculated from CSV
-            trading_status['max_drawdown'] = 0.0  # Will be calculated from CSV
-            trading_status['sharpe_ratio'] = 0.0  # Will be calculated from CSV
-            
+            metrics = performance_metrics(portfolio_csv)
         except Exception as e:
+            metrics = {}
             logger.error(f"Error getting daily results: {e}")
         
-        trading_status['last_update'] = datetime.now().isoformat()
-        trading_status['is_running'] = False
+        state = _set_status(
+            current_portfolio=portfolio_df.to_dict('records'),
+            cash_balance=cash,
+            total_equity=_total_equity(portfolio_df, cash),
+            last_update=datetime.now().isoformat(),
+            is_running=False,
+            **metrics,
+        )
         
         # Emit status update to web UI
-        socketio.emit('trading_update', trading_status)
+        socketio.emit('trading_update', asdict(state))
+        _push_portfolio_update(state.current_portfolio, cash, state.total_equity)
         
     except Exception as e:
-        trading_status['error'] = str(e)
-        trading_status['is_running'] = False
-        logger.error(f"Trading error: {e}")
-        traceback.print_exc()
+        _set_status(error=str(e), is_running=False)
+        logger.exception("Trading error")
         socketio.emit('trading_error', {'error': str(e)})
 
 @app.route('/')
@@ -476,13 +738,13 @@ def index():
                          portfolio=portfolio, 
                          cash=cash, 
                          history=history,
-                         trading_status=trading_status)
+                         trading_status=asdict(_state))
 
 @app.route('/start_trading', methods=['POST'])
 @login_required
 def start_trading():
     """Start automated trading"""
-    if trading_status['is_running']:
+    if _state.is_running:
         return jsonify({'status': 'error', 'message': 'Trading already in progress'})
     
     # Start trading in background thread
@@ -496,14 +758,14 @@ def start_trading():
 @login_required
 def stop_trading():
     """Stop automated trading"""
-    trading_status['is_running'] = False
+    _set_status(is_running=False)
     return jsonify({'status': 'success', 'message': 'Trading stopped'})
 
 @app.route('/get_status')
 @login_required
 def get_status():
     """Get current trading status"""
-    return jsonify(trading_status)
+    return jsonify(asdict(_state))
 
 @app.route('/get_portfolio')
 @login_required
@@ -513,7 +775,7 @@ def get_portfolio():
     return jsonify({
         'portfolio': portfolio,
         'cash': cash,
-        'total_equity': sum(float(stock.get('shares', 0)) * float(stock.get('buy_price', 0)) for stock in (portfolio or [])) + cash
+        'total_equity': _total_equity(portfolio, cash)
     })
 
 @app.route('/get_history')
@@ -538,40 +800,34 @@ def configure():
                 
             if 'benchmarks' in data:
                 # Update benchmark tickers
-                script_dir = Path(__file__).resolve().parent
-                tickers_file = script_dir / "tickers.json"
+                tickers_file = TICKERS_JSON
                 
                 config = {
                     "benchmarks": data['benchmarks']
                 }
                 
-                with open(tickers_file, 'w') as f:
-                    json.dump(config, f, indent=2)
+                _write_json_file(tickers_file, config)
             
             return jsonify({'status': 'success'})
         except Exception as e:
             return jsonify({'status': 'error', 'message': str(e)})
     
     # Load current configuration
-    script_dir = Path(__file__).resolve().parent
-    tickers_file = script_dir / "tickers.json"
+    tickers_file = TICKERS_JSON
     
-    config = {}
-    if tickers_file.exists():
-        try:
-            with open(tickers_file, 'r') as f:
-                config = json.load(f)
-        except:
-            config = {"benchmarks": ["IWO", "XBI", "SPY", "IWM"]}
-    else:
+    try:
+        config = _read_json_cached(tickers_file)
+    except Exception:
+        config = None
+    if config is None:
         config = {"benchmarks": ["IWO", "XBI", "SPY", "IWM"]}
     
     # Also surface .env-based settings to the page
     env_settings = {
-        'starting_cash': float(os.getenv('STARTING_CASH', '10000')),
-        'sched_interval': int(os.getenv('SCHED_INTERVAL_MINUTES', '15')),
-        'sched_market_hours_only': os.getenv('SCHED_MARKET_HOURS_ONLY', 'true').lower() == 'true',
-        'debug': os.getenv('DEBUG', 'false').lower() == 'true',
+        'starting_cash': STARTING_CASH,
+        'sched_interval': SCHED_INTERVAL_MINUTES,
+        'sched_market_hours_only': SCHED_MARKET_HOURS_ONLY,
+        'debug': DEBUG,
     }
     return render_template('configure.html', config=config, env_settings=env_settings)
 
@@ -579,27 +835,21 @@ def configure():
 @login_required
 def settings_api():
     """Read or update environment-like settings via a local file (settings.json) so user can edit in UI without touching .env."""
-    settings_path = Path(__file__).resolve().parent / 'settings.json'
+    settings_path = SETTINGS_JSON
     if request.method == 'GET':
-        if settings_path.exists():
-            try:
-                with settings_path.open('r', encoding='utf-8') as fh:
-                    return jsonify(json.load(fh))
-            except Exception:
-                pass
+        try:
+            data = _read_json_cached(settings_path)
+            if data is not None:
+                return jsonify(data)
+        except Exception:
+            pass
         # fallback to environment
-        return jsonify({
-            'STARTING_CASH': os.getenv('STARTING_CASH', '10000'),
-            'SCHED_INTERVAL_MINUTES': os.getenv('SCHED_INTERVAL_MINUTES', '15'),
-            'SCHED_MARKET_HOURS_ONLY': os.getenv('SCHED_MARKET_HOURS_ONLY', 'true'),
-            'DEBUG': os.getenv('DEBUG', 'false'),
-        })
+        return jsonify(_ENV_SETTINGS)
 
     # POST -> write settings.json (non-secret), which the app will read on next start if desired
     try:
         data = request.get_json(force=True) or {}
-        with settings_path.open('w', encoding='utf-8') as fh:
-            json.dump(data, fh, indent=2)
+        _write_json_file(settings_path, data)
         return jsonify({'status': 'success'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 400
@@ -607,7 +857,7 @@ def settings_api():
 @socketio.on('connect')
 def handle_connect():
     """Handle WebSocket connection"""
-    emit('status', trading_status)
+    emit('status', asdict(_state))
 
 @socketio.on('disconnect')
 def handle_disconnect():
@@ -615,4 +865,9 @@ def handle_disconnect():
     pass
 
 if __name__ == '__main__':
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
+    socketio.run(
+        app,
+        debug=DEBUG,
+        host='0.0.0.0',
+        port=int(os.getenv('PORT', '5000')),
+    )
@@ -10,10 +10,13 @@ Usage:
 
 import json
 import os
-import re
 import argparse
+import hashlib
+import sqlite3
+import time
+from contextlib import closing
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, NamedTuple, Optional, Tuple
 import pandas as pd
 
 # Import existing trading functions
@@ -28,6 +31,30 @@ try:
 except ImportError:
     HAS_OPENAI = False
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Pick up OPENAI_API_KEY etc. from .env exactly once, at import (same as app.py)
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+
+def _json_loads(text: str) -> Any:
+    """Parse JSON with orjson when available (its JSONDecodeError subclasses the stdlib one)."""
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def _json_line(obj: Any) -> bytes:
+    """Serialize `obj` as one UTF-8 JSON line for the .jsonl response log."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj) + "\n").encode("utf-8")
+
 
 def generate_trading_prompt(portfolio_df: pd.DataFrame, cash: float, total_equity: float) -> str:
     """Generate a trading prompt with current portfolio data"""
@@ -36,7 +63,8 @@ def generate_trading_prompt(portfolio_df: pd.DataFrame, cash: float, total_equit
     if portfolio_df.empty:
         holdings_text = "No current holdings"
     else:
-        holdings_text = portfolio_df.to_string(index=False)
+        # Compact CSV rather than a space-padded table: same data, far fewer prompt tokens
+        holdings_text = portfolio_df.to_csv(index=False).strip()
     
     # Get current date
     today = last_trading_date().date().isoformat()
@@ -51,7 +79,7 @@ Cash Balance: ${cash:,.2f}
 Total Equity: ${total_equity:,.2f}
 
 Rules:
-- You have ${cash:,.2f} in cash available for new positions
+- Only the Cash Balance above is available for new positions
 - Prefer U.S. micro-cap stocks (<$300M market cap)
 - Full shares only, no options or derivatives
 - Use stop-losses for risk management
@@ -80,56 +108,186 @@ Only recommend trades you are confident about. If no trades are recommended, use
     return prompt
 
 
-def call_openai_api(prompt: str, api_key: str, model: str = "gpt-4") -> str:
-    """Call OpenAI API and return response"""
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "3600"))  # seconds a cached reply stays valid
+_TRUTHY = frozenset({"1", "true", "yes", "on"})
+
+
+def _llm_cache_key(model: str, prompt: str) -> str:
+    return hashlib.blake2b(f"{model}\0{prompt}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _llm_cache_db(cache_path: Path) -> sqlite3.Connection:
+    db = sqlite3.connect(cache_path)
+    db.execute("CREATE TABLE IF NOT EXISTS replies (k TEXT PRIMARY KEY, ts INTEGER, v TEXT)")
+    return db
+
+
+def _llm_cache_get(cache_path: Path, key: str) -> Optional[str]:
+    """Return a cached reply younger than LLM_CACHE_TTL, or None (also when the cache is unusable)."""
+    try:
+        with closing(_llm_cache_db(cache_path)) as db:
+            row = db.execute("SELECT ts, v FROM replies WHERE k = ?", (key,)).fetchone()
+    except sqlite3.Error as e:
+        # The cache is optional: a locked, read-only or corrupt DB just means asking the API
+        print(f"LLM cache unavailable ({type(e).__name__}: {e}); calling the API")
+        return None
+    if row and time.time() - row[0] < LLM_CACHE_TTL:
+        return row[1]
+    return None
+
+
+def _llm_cache_put(cache_path: Path, key: str, reply: str) -> None:
+    try:
+        with closing(_llm_cache_db(cache_path)) as db, db:
+            db.execute("INSERT OR REPLACE INTO replies VALUES (?, ?, ?)", (key, int(time.time()), reply))
+    except sqlite3.Error as e:
+        print(f"LLM cache write skipped ({type(e).__name__}: {e})")
+
+
+_OPENAI_CLIENTS: Dict[str, Any] = {}
+
+
+def _get_openai_client(api_key: str) -> Any:
+    """One OpenAI client per API key, so its pooled HTTP connection is reused across calls.
+
+    The SDK's retries (with backoff) only cover transient failures: timeouts, 408/409/429 and 5xx.
+    """
+    client = _OPENAI_CLIENTS.get(api_key)
+    if client is None:
+        client = _OPENAI_CLIENTS[api_key] = openai.OpenAI(api_key=api_key, max_retries=2, timeout=60.0)
+    return client
+
+
+def call_openai_api(
+    prompt: str,
+    api_key: str,
+    model: str = "gpt-4",
+    cache_path: Optional[Path] = None,
+    fallback_model: Optional[str] = None,
+) -> str:
+    """Call OpenAI API and return response.
+
+    With cache_path set, identical (model, prompt) requests within LLM_CACHE_TTL are
+    answered from a local SQLite cache instead of a new API round-trip. With
+    fallback_model set, an outage/timeout/missing-model failure is retried once on it.
+    """
+    return _call_openai(prompt, api_key, model, cache_path, fallback_model)[0]
+
+
+def _is_fallback_worthy(exc: Exception) -> bool:
+    """Only outages, timeouts and a missing model justify another request; client-side errors never do."""
+    if isinstance(exc, (openai.APIConnectionError, openai.NotFoundError)):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+
+def _call_openai(
+    prompt: str, api_key: str, model: str, cache_path: Optional[Path], fallback_model: Optional[str]
+) -> Tuple[str, str]:
+    """call_openai_api(), also returning which model produced the reply."""
     if not HAS_OPENAI:
         raise ImportError("openai package not installed. Run: pip install openai")
-    
-    client = openai.OpenAI(api_key=api_key)
-    
-    try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a professional portfolio analyst. Always respond with valid JSON in the exact format requested."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=1500
-        )
+
+    key = _llm_cache_key(model, prompt) if cache_path else None
+    if key:
+        cached = _llm_cache_get(cache_path, key)
+        if cached is not None:
+            return cached, model
+
+    client = _get_openai_client(api_key)
+    messages = [
+        {"role": "system", "content": "You are a professional portfolio analyst. Always respond with valid JSON in the exact format requested."},
+        {"role": "user", "content": prompt}
+    ]
+
+    def complete(c: Any, m: str) -> str:
+        response = c.chat.completions.create(model=m, messages=messages, temperature=0.3, max_tokens=1500)
         return response.choices[0].message.content
+
+    try:
+        content = complete(client, model)
     except Exception as e:
-        return f'{{"error": "API call failed: {e}"}}'
+        if not (fallback_model and fallback_model != model and _is_fallback_worthy(e)):
+            # Auth/permission/validation/quota errors fail identically on any model: report without another request
+            return f'{{"error": "API call failed ({type(e).__name__}): {e}"}}', model
+        print(f"WARNING: OpenAI call failed on {model} ({type(e).__name__}); retrying once with {fallback_model}")
+        try:
+            # Single shot: the client's transient retries already ran for the primary model
+            return complete(client.with_options(max_retries=0), fallback_model), fallback_model
+        except Exception as e2:
+            return f'{{"error": "API call failed ({type(e2).__name__}): {e2}"}}', fallback_model
+
+    # Only successful replies are cached; failures always retry on the next call
+    if key and content:
+        _llm_cache_put(cache_path, key, content)
+    return content, model
 
 
 def parse_llm_response(response: str) -> Dict[str, Any]:
     """Parse LLM response and extract trading decisions"""
     try:
-        # Try to extract JSON from response
-        json_match = re.search(r'\{.*\}', response, re.DOTALL)
-        if json_match:
-            json_str = json_match.group()
-            return json.loads(json_str)
+        # Try to extract JSON from response: outermost {...} block, tolerating prose/code fences around it
+        start = response.find('{')
+        end = response.rfind('}')
+        if start != -1 and end > start:
+            # Bare JSON (the common case) is parsed as-is; only fenced/prose replies are sliced
+            bare = start == 0 and end == len(response) - 1
+            return _json_loads(response if bare else response[start:end + 1])
         else:
-            return json.loads(response)
+            return _json_loads(response)
     except json.JSONDecodeError as e:
         print(f"Failed to parse LLM response: {e}")
         print(f"Raw response: {response}")
         return {"error": "Failed to parse response", "raw_response": response}
 
 
-def execute_automated_trades(trades: List[Dict[str, Any]], portfolio_df: pd.DataFrame, cash: float) -> tuple[pd.DataFrame, float]:
-    """Execute trades recommended by LLM"""
+def _to_number(value: Any, default: float = 0.0) -> float:
+    """Numeric field from LLM JSON: ints/floats pass through untouched, strings are parsed once, junk -> default."""
+    if isinstance(value, bool):  # bool is an int subclass; true/false is not a quantity or price
+        return default
+    if type(value) is int or type(value) is float:
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class TradeIntent(NamedTuple):
+    """One LLM trade recommendation, normalized once (lower-case action, upper-case ticker, numeric fields)."""
+    action: str
+    ticker: str
+    shares: float
+    price: float
+    stop_loss: float
+    reason: str
+
+
+def normalize_trades(trades: List[Any]) -> List[TradeIntent]:
+    """Coerce raw trade dicts from the LLM into TradeIntents in a single pass."""
+    intents = []
+    for trade in trades:
+        if isinstance(trade, TradeIntent):
+            intents.append(trade)
+            continue
+        intents.append(TradeIntent(
+            action=str(trade.get('action') or '').strip().lower(),
+            ticker=str(trade.get('ticker') or '').strip().upper(),
+            shares=_to_number(trade.get('shares')),
+            price=_to_number(trade.get('price')),
+            stop_loss=_to_number(trade.get('stop_loss')),
+            reason=trade.get('reason') or 'LLM recommendation',
+        ))
+    return intents
+
+
+def execute_automated_trades(trades: List[Any], portfolio_df: pd.DataFrame, cash: float) -> tuple[pd.DataFrame, float]:
+    """Execute trades recommended by LLM (raw dicts or TradeIntents)"""
     
     print(f"\n=== Executing {len(trades)} LLM-recommended trades ===")
     
-    for trade in trades:
-        action = trade.get('action', '').lower()
-        ticker = trade.get('ticker', '').upper()
-        shares = float(trade.get('shares', 0))
-        price = float(trade.get('price', 0))
-        stop_loss = float(trade.get('stop_loss', 0))
-        reason = trade.get('reason', 'LLM recommendation')
+    for trade in normalize_trades(trades):
+        action, ticker, shares, price, stop_loss, reason = trade
         
         if action == 'buy':
             if shares > 0 and price > 0 and ticker:
@@ -165,7 +323,13 @@ def execute_automated_trades(trades: List[Dict[str, Any]], portfolio_df: pd.Data
     return portfolio_df, cash
 
 
-def run_automated_trading(api_key: str, model: str = "gpt-4", data_dir: str = "Start Your Own", dry_run: bool = False):
+def run_automated_trading(
+    api_key: str,
+    model: str = "gpt-4",
+    data_dir: str = "Start Your Own",
+    dry_run: bool = False,
+    fallback_model: Optional[str] = None,
+):
     """Run the automated trading process"""
     
     print("=== Automated Trading System ===")
@@ -194,8 +358,11 @@ def run_automated_trading(api_key: str, model: str = "gpt-4", data_dir: str = "S
     
     # Call LLM
     print("Calling LLM for trading recommendations...")
-    response = call_openai_api(prompt, api_key, model)
-    print(f"Received response ({len(response)} characters)")
+    cache_path = data_path / "llm_cache.sqlite" if os.getenv("LLM_CACHE", "").strip().lower() in _TRUTHY else None
+    response, answered_by = _call_openai(prompt, api_key, model, cache_path, fallback_model)
+    print(f"Received response ({len(response)} characters) from {answered_by}")
+    if answered_by != model:
+        print(f"WARNING: {model} was unavailable; these recommendations come from fallback model {answered_by}")
     
     # Parse response
     parsed_response = parse_llm_response(response)
@@ -207,7 +374,7 @@ def run_automated_trading(api_key: str, model: str = "gpt-4", data_dir: str = "S
     # Display analysis
     analysis = parsed_response.get('analysis', 'No analysis provided')
     confidence = parsed_response.get('confidence', 0.0)
-    trades = parsed_response.get('trades', [])
+    trades = normalize_trades([t for t in (parsed_response.get('trades') or []) if isinstance(t, dict)])
     
     print(f"\n=== LLM Analysis ===")
     print(f"Analysis: {analysis}")
@@ -220,18 +387,19 @@ def run_automated_trading(api_key: str, model: str = "gpt-4", data_dir: str = "S
     elif trades and dry_run:
         print(f"\n=== DRY RUN - Would execute {len(trades)} trades ===")
         for trade in trades:
-            print(f"  {trade.get('action', 'unknown').upper()}: {trade.get('shares', 0)} shares of {trade.get('ticker', 'unknown')} at ${trade.get('price', 0):.2f}")
+            print(f"  {(trade.action or 'unknown').upper()}: {trade.shares} shares of {trade.ticker or 'unknown'} at ${trade.price:.2f}")
     else:
         print("No trades recommended")
     
     # Save the LLM response for review
     response_file = data_path / "llm_responses.jsonl"
-    with open(response_file, "a") as f:
-        f.write(json.dumps({
+    with open(response_file, "ab") as f:
+        f.write(_json_line({
             "timestamp": pd.Timestamp.now().isoformat(),
+            "model": answered_by,
             "response": parsed_response,
             "raw_response": response
-        }) + "\n")
+        }))
     
     print(f"\n=== Analysis Complete ===")
     print(f"Response saved to: {response_file}")
@@ -242,6 +410,7 @@ def main():
     parser = argparse.ArgumentParser(description="Simple Automated Trading")
     parser.add_argument("--api-key", help="OpenAI API key (or set OPENAI_API_KEY env var)")
     parser.add_argument("--model", default="gpt-4", help="OpenAI model to use")
+    parser.add_argument("--fallback-model", help="Model to retry once on if --model is down, times out or is missing (off by default)")
     parser.add_argument("--data-dir", default="Start Your Own", help="Data directory")
     parser.add_argument("--dry-run", action="store_true", help="Don't execute trades, just show recommendations")
     
@@ -258,7 +427,8 @@ def main():
         api_key=api_key,
         model=args.model,
         data_dir=args.data_dir,
-        dry_run=args.dry_run
+        dry_run=args.dry_run,
+        fallback_model=args.fallback_model,
     )
 
 
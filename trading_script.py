@@ -16,25 +16,34 @@ Notes:
 
 from __future__ import annotations
 
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from functools import cache
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, cast,Dict, List, Optional
+from typing import Any, Callable, cast,Dict, Iterator, List, Optional
 import os
+import stat
+import threading
 import warnings
 
+import importlib.util
 import numpy as np
 import pandas as pd
-import yfinance as yf
 import json
 import logging
 
-# Optional pandas-datareader import for Stooq access
+# Optional orjson for faster JSON config reads/writes (stdlib json fallback)
 try:
-    import pandas_datareader.data as pdr
-    _HAS_PDR = True
-except Exception:
-    _HAS_PDR = False
+    import orjson
+except ImportError:
+    orjson = None
+
+# yfinance and pandas-datareader are heavy to import and only needed once a download
+# actually happens, so they are imported lazily inside the fetchers. Only probe for
+# pandas-datareader (optional, used for Stooq access) here.
+_HAS_PDR = importlib.util.find_spec("pandas_datareader") is not None
 
 # Silence display-only deprecation chatter in console
 warnings.filterwarnings("ignore", category=FutureWarning)
@@ -79,6 +88,47 @@ DEFAULT_BENCHMARKS = ["IWO", "XBI", "SPY", "IWM"]
 
 logger = logging.getLogger(__name__)
 
+def _json_loads(raw: bytes) -> Any:
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+def atomic_write_bytes(path: Path, payload: bytes) -> None:
+    """Publish `payload` at `path` via a sibling temp file + os.replace; the temp is removed on failure.
+
+    The temp file gets a unique name (mkstemp), so concurrent writers of the same path never
+    share it. The payload goes out in a single os.write (looping only on a short write) and is
+    fsync'd before the rename, so a crash leaves either the old file or the complete new one.
+    """
+    import tempfile
+
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    tmp_path = Path(tmp_name)
+    try:
+        # mkstemp creates the file 0600; keep the target's mode (0644 for a new file) across the swap
+        try:
+            mode = stat.S_IMODE(path.stat().st_mode)
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        try:
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+def _json_write(path: Path, data: Any) -> None:
+    """Atomically write `data` to `path` as 2-space indented JSON."""
+    if orjson is not None:
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    else:
+        payload = json.dumps(data, indent=2).encode("utf-8")
+    atomic_write_bytes(path, payload)
+
 def _read_json_file(path: Path) -> Optional[Dict]:
     """Read and parse JSON from `path`. Return dict on success, None if not found or invalid.
 
@@ -87,8 +137,7 @@ def _read_json_file(path: Path) -> Optional[Dict]:
     - Other IO errors -> log a warning and return None
     """
     try:
-        with path.open("r", encoding="utf-8") as fh:
-            return json.load(fh)
+        return _json_loads(path.read_bytes())
     except FileNotFoundError:
         return None
     except json.JSONDecodeError as exc:
@@ -98,6 +147,11 @@ def _read_json_file(path: Path) -> Optional[Dict]:
         logger.warning("Unable to read tickers.json (%s): %s. Falling back to defaults.", path, exc)
         return None
 
+@cache
+def _resolved_config_path(base: Path, name: str) -> Path:
+    """Absolute path of config file `name` under `base`; resolving stats the filesystem, so do it once."""
+    return (base / name).resolve()
+
 def load_benchmarks(script_dir: Path | None = None) -> List[str]:
     """Return a list of benchmark tickers.
 
@@ -119,7 +173,7 @@ def load_benchmarks(script_dir: Path | None = None) -> List[str]:
     cfg = None
     cfg_path = None
     for c in candidates:
-        p = (c / "tickers.json").resolve()
+        p = _resolved_config_path(c, "tickers.json")
         data = _read_json_file(p)
         if data is not None:
             cfg = data
@@ -134,17 +188,9 @@ def load_benchmarks(script_dir: Path | None = None) -> List[str]:
         logger.warning("tickers.json at %s missing 'benchmarks' array. Falling back to defaults.", cfg_path)
         return DEFAULT_BENCHMARKS.copy()
 
-    seen = set()
-    result: list[str] = []
-    for t in benchmarks:
-        if not isinstance(t, str):
-            continue
-        up = t.strip().upper()
-        if not up:
-            continue
-        if up not in seen:
-            seen.add(up)
-            result.append(up)
+    # dict.fromkeys dedupes in insertion order with one hash op per ticker (vs. a seen-set probe + add)
+    normalized = (t.strip().upper() for t in benchmarks if isinstance(t, str))
+    result = list(dict.fromkeys(up for up in normalized if up))
 
     return result if result else DEFAULT_BENCHMARKS.copy()
 
@@ -205,41 +251,81 @@ def _to_datetime_index(df: pd.DataFrame) -> pd.DataFrame:
             pass
     return df
 
+_OHLCV_COLS = ("Open", "High", "Low", "Close", "Adj Close", "Volume")
+
 def _normalize_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
     # Ensure all expected columns exist
-    for c in ["Open", "High", "Low", "Close", "Volume"]:
-        if c not in df.columns:
+    present = set(df.columns)
+    for c in ("Open", "High", "Low", "Close", "Volume"):
+        if c not in present:
             df[c] = np.nan
-    if "Adj Close" not in df.columns:
+    if "Adj Close" not in present:
         df["Adj Close"] = df["Close"]
-    cols = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
-    return df[cols]
+    return df[list(_OHLCV_COLS)]
+
+_HTTP_SESSION = None
+
+def _get_http_session():
+    """Return a process-wide requests.Session with keep-alive pooling and retries.
+
+    Reusing one session avoids a fresh TCP+TLS handshake on every price request.
+    """
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        sess = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retry)
+        sess.mount("https://", adapter)
+        sess.mount("http://", adapter)
+        sess.headers.update({
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+            "Connection": "keep-alive",
+        })
+        _HTTP_SESSION = sess
+    return _HTTP_SESSION
+
+@cache
+def _yf_download_params() -> frozenset[str]:
+    """Keyword arguments the installed yfinance.download() accepts (older releases take no `session`)."""
+    import inspect
+    import yfinance as yf
+
+    return frozenset(inspect.signature(yf.download).parameters)
+
+# yf.download() resets module-global state (shared._DFS) on every call, so concurrent calls from
+# thread-pool workers would clobber each other's frames; only one may run at a time. Batch several
+# tickers into one call (download_price_batch) rather than fanning single-ticker calls out.
+_YF_LOCK = threading.Lock()
 
 def _yahoo_download(ticker: str, **kwargs: Any) -> pd.DataFrame:
-    """Call yfinance.download with a real UA and silence all chatter."""
-    import io, logging, requests
-    from contextlib import redirect_stderr, redirect_stdout
+    """Call yfinance.download with a real UA; its error chatter is muted via the yfinance logger.
+
+    May run on thread-pool workers, so it must not touch process-wide state such as
+    sys.stdout/sys.stderr or the warnings filters.
+    """
+    import yfinance as yf
 
-    sess = requests.Session()
-    sess.headers.update({"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"})
     kwargs.setdefault("progress", False)
     kwargs.setdefault("threads", False)
-    kwargs.setdefault("session", sess)
+    if "session" in _yf_download_params():
+        kwargs.setdefault("session", _get_http_session())
 
     logging.getLogger("yfinance").setLevel(logging.CRITICAL)
-    buf = io.StringIO()
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-        try:
-            with redirect_stdout(buf), redirect_stderr(buf):
-                df = cast(pd.DataFrame, yf.download(ticker, **kwargs))
-        except Exception:
-            return pd.DataFrame()
+    try:
+        with _YF_LOCK:
+            df = cast(pd.DataFrame, yf.download(ticker, **kwargs))
+    except Exception:
+        logger.debug("Yahoo download failed for %s", ticker, exc_info=True)
+        return pd.DataFrame()
     return df if isinstance(df, pd.DataFrame) else pd.DataFrame()
 
 def _stooq_csv_download(ticker: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
     """Fetch OHLCV from Stooq CSV endpoint (daily). Good for US tickers and many ETFs."""
-    import requests, io
+    import io
     if ticker in STOOQ_BLOCKLIST:
         return pd.DataFrame()
     t = STOOQ_MAP.get(ticker, ticker)
@@ -254,10 +340,12 @@ def _stooq_csv_download(ticker: str, start: pd.Timestamp, end: pd.Timestamp) ->
 
     url = f"https://stooq.com/q/d/l/?s={sym}&i=d"
     try:
-        r = requests.get(url, timeout=10)
-        if r.status_code != 200 or not r.text.strip():
+        r = _get_http_session().get(url, timeout=10)
+        body = r.content
+        if r.status_code != 200 or not body.strip():
             return pd.DataFrame()
-        df = pd.read_csv(io.StringIO(r.text))
+        # Parse the raw bytes directly; avoids decoding the payload into an intermediate str
+        df = pd.read_csv(io.BytesIO(body))
         if df.empty:
             return pd.DataFrame()
 
@@ -293,7 +381,10 @@ def _stooq_download(
         if not _HAS_PDR:
             return pd.DataFrame()
         import pandas_datareader.data as pdr_local
-        df = cast(pd.DataFrame, pdr_local.DataReader(t, "stooq", start=start, end=end))
+        df = cast(
+            pd.DataFrame,
+            pdr_local.DataReader(t, "stooq", start=start, end=end, session=_get_http_session()),
+        )
         df.sort_index(inplace=True)
         return df
     except Exception:
@@ -323,6 +414,43 @@ def _weekend_safe_range(period: str | None, start: Any, end: Any) -> tuple[pd.Ti
     end_ts = (end_trading + pd.Timedelta(days=1)).normalize()
     return start_ts, end_ts
 
+# Memo for download_price_data(); only active inside price_data_cache(). Held in a ContextVar so
+# concurrent app requests each see only their own block's memo (see run_in_context for workers).
+_PRICE_MEMO: ContextVar[dict[tuple, FetchResult] | None] = ContextVar("_PRICE_MEMO", default=None)
+# download kwargs that don't affect the returned data, so they are left out of memo keys
+_MEMO_IGNORED_KWARGS = frozenset({"progress", "threads"})
+
+@contextmanager
+def price_data_cache() -> Iterator[None]:
+    """Memoize download_price_data() results for the duration of the block.
+
+    Lets a caller prefetch bars concurrently and have the per-order lookups in
+    log_manual_buy/log_manual_sell/process_portfolio reuse them. Empty results
+    are not cached. Nested blocks share the outermost memo.
+    """
+    if _PRICE_MEMO.get() is not None:
+        yield
+        return
+    token = _PRICE_MEMO.set({})
+    try:
+        yield
+    finally:
+        _PRICE_MEMO.reset(token)
+
+def run_in_context(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap `fn` so each call runs in a copy of the *current* context.
+
+    Pool workers don't inherit the submitting thread's context; wrapping the task
+    where it is submitted lets them read and fill the caller's price_data_cache() memo.
+    """
+    ctx = copy_context()
+    return lambda *args: ctx.copy().run(fn, *args)
+
+def _memo_key(ticker: str, s: pd.Timestamp, e: pd.Timestamp, kwargs: dict[str, Any]) -> tuple:
+    # Key on the window's epoch nanoseconds: plain ints hash far cheaper than Timestamp objects
+    opts = tuple(sorted((k, v) for k, v in kwargs.items() if k not in _MEMO_IGNORED_KWARGS))
+    return (ticker, s.value, e.value, opts)
+
 def download_price_data(ticker: str, **kwargs: Any) -> FetchResult:
     """
     Robust OHLCV fetch with multi-stage fallbacks:
@@ -343,6 +471,19 @@ def download_price_data(ticker: str, **kwargs: Any) -> FetchResult:
 
     s, e = _weekend_safe_range(period, start, end)
 
+    memo = _PRICE_MEMO.get()
+    if memo is None:
+        return _fetch_price_data(ticker, s, e, kwargs)
+    key = _memo_key(ticker, s, e, kwargs)
+    hit = memo.get(key)
+    if hit is None:
+        hit = _fetch_price_data(ticker, s, e, kwargs)
+        if hit.df.empty:
+            return hit
+        memo[key] = hit
+    return FetchResult(hit.df.copy(), hit.source)
+
+def _fetch_price_data(ticker: str, s: pd.Timestamp, e: pd.Timestamp, kwargs: dict[str, Any]) -> FetchResult:
     # ---------- 1) Yahoo (date-bounded) ----------
     df_y = _yahoo_download(ticker, start=s, end=e, **kwargs)
     if isinstance(df_y, pd.DataFrame) and not df_y.empty:
@@ -370,6 +511,90 @@ def download_price_data(ticker: str, **kwargs: Any) -> FetchResult:
     empty = pd.DataFrame(columns=["Open", "High", "Low", "Close", "Adj Close", "Volume"])
     return FetchResult(empty, "empty")
 
+def _batch_frames(raw: pd.DataFrame, syms: List[str]) -> Iterator[tuple[str, pd.DataFrame]]:
+    """Yield (ticker, bars) for each symbol a multi-ticker yf.download(group_by="ticker") served."""
+    if raw.empty:
+        return
+    multi = isinstance(raw.columns, pd.MultiIndex)
+    level0 = set(raw.columns.get_level_values(0)) if multi else set()
+    for t in syms:
+        if multi:
+            if t not in level0:
+                continue
+            sub = raw[t]
+        elif len(syms) == 1:
+            sub = raw
+        else:
+            continue
+        if "Close" not in sub.columns:
+            continue
+        sub = sub.dropna(subset=["Close"])
+        if not sub.empty:
+            yield t, sub
+
+def download_price_batch(tickers: List[str], **kwargs: Any) -> dict[str, FetchResult]:
+    """
+    Fetch OHLCV for many tickers with a single multi-symbol Yahoo request.
+
+    Takes the same range kwargs as download_price_data(). Returns {ticker: FetchResult}
+    for the tickers Yahoo served; callers fall back to download_price_data() for a
+    missing ticker only once they actually need it. Inside price_data_cache(), memo
+    hits are reused and the batch results are memoized.
+    """
+    period = kwargs.pop("period", None)
+    start = kwargs.pop("start", None)
+    end = kwargs.pop("end", None)
+    kwargs.setdefault("progress", False)
+    s, e = _weekend_safe_range(period, start, end)
+
+    memo = _PRICE_MEMO.get()
+    out: dict[str, FetchResult] = {}
+    want: list[str] = []
+    for t in dict.fromkeys(tickers):
+        if not t:
+            continue
+        hit = memo.get(_memo_key(t, s, e, kwargs)) if memo is not None else None
+        if hit is not None:
+            out[t] = FetchResult(hit.df.copy(), hit.source)
+        else:
+            want.append(t)
+    if not want:
+        return out
+
+    raw = _yahoo_download(" ".join(want), start=s, end=e, **{**kwargs, "group_by": "ticker", "threads": True})
+    for t, sub in _batch_frames(raw, want):
+        res = FetchResult(_normalize_ohlcv(_to_datetime_index(sub)), "yahoo")
+        if memo is not None:
+            memo[_memo_key(t, s, e, kwargs)] = res
+            res = FetchResult(res.df.copy(), res.source)
+        out[t] = res
+    return out
+
+def download_latest_closes(tickers: List[str], start: Any, end: Any) -> dict[str, tuple[float, float]]:
+    """
+    Fetch the latest Close and Volume for many tickers in a single Yahoo request.
+
+    Returns {TICKER: (close, volume)}. Tickers Yahoo could not serve are left out
+    so callers can fall back to download_price_data() for just those symbols.
+    """
+    syms = list(dict.fromkeys(str(t).strip().upper() for t in tickers if str(t).strip()))
+    if not syms:
+        return {}
+
+    s, e = _weekend_safe_range(None, start, end)
+    raw = _yahoo_download(" ".join(syms), start=s, end=e, group_by="ticker", threads=True)
+    out: dict[str, tuple[float, float]] = {}
+    if raw.empty:
+        logger.info("Batched Yahoo close lookup returned no data for %d tickers; using per-ticker fetches", len(syms))
+        return out
+
+    for t, sub in _batch_frames(raw, syms):
+        try:
+            out[t] = (float(sub["Close"].iloc[-1]), float(sub["Volume"].fillna(0).iloc[-1]))
+        except Exception:
+            continue
+    return out
+
 
 
 # ------------------------------
@@ -380,18 +605,21 @@ def _lock_path(csv_path: Path) -> Path:
     return csv_path.with_suffix(csv_path.suffix + ".lock")
 
 def _acquire_lock(csv_path: Path, timeout_s: float = 10.0, poll_s: float = 0.2) -> bool:
+    """Create the lock file, retrying with exponential backoff (10ms doubling up to poll_s)."""
     import time
     lock = _lock_path(csv_path)
-    start = time.time()
+    start = time.monotonic()
+    delay = min(0.01, poll_s)
     while True:
         try:
             fd = os.open(str(lock), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
             os.close(fd)
             return True
         except FileExistsError:
-            if (time.time() - start) > timeout_s:
+            if (time.monotonic() - start) > timeout_s:
                 return False
-            time.sleep(poll_s)
+            time.sleep(delay)
+            delay = min(delay * 2, poll_s)
 
 def _release_lock(csv_path: Path) -> None:
     try:
@@ -401,19 +629,34 @@ def _release_lock(csv_path: Path) -> None:
     except Exception:
         pass
 
-def _write_csv_idempotent(csv_path: Path, df_new: pd.DataFrame, subset_cols: list[str] | None = None) -> None:
+def _write_csv_idempotent(
+    csv_path: Path,
+    df_new: pd.DataFrame,
+    subset_cols: list[str] | None = None,
+    replace_date: str | None = None,
+) -> None:
     """Append/replace rows in a CSV idempotently, with a simple file lock.
 
     If subset_cols is provided, duplicates are dropped based on those columns.
     Otherwise, fully duplicate rows are dropped.
+    If replace_date is given, existing rows with that Date are dropped first, so
+    df_new becomes the complete set of rows for that day.
     """
+    import io
     ok = _acquire_lock(csv_path)
     try:
-        if csv_path.exists():
+        # EAFP: one open() instead of a stat() for exists() followed by the open
+        try:
+            raw = csv_path.read_bytes()
+        except FileNotFoundError:
+            raw = None
+        if raw is not None:
             try:
-                existing = pd.read_csv(csv_path)
+                existing = pd.read_csv(io.BytesIO(raw))
             except Exception:
                 existing = pd.DataFrame()
+            if replace_date is not None and "Date" in existing.columns:
+                existing = existing[existing["Date"].astype(str) != replace_date]
             merged = pd.concat([existing, df_new], ignore_index=True)
         else:
             merged = df_new.copy()
@@ -423,9 +666,12 @@ def _write_csv_idempotent(csv_path: Path, df_new: pd.DataFrame, subset_cols: lis
         else:
             merged = merged.drop_duplicates(keep="last")
 
-        tmp_path = csv_path.with_suffix(csv_path.suffix + ".tmp")
-        merged.to_csv(tmp_path, index=False)
-        os.replace(tmp_path, csv_path)
+        # Skip the rewrite entirely when the merge changed nothing (e.g. a repeated run)
+        payload = merged.to_csv(index=False).encode("utf-8")
+        if payload == raw:
+            return
+
+        atomic_write_bytes(csv_path, payload)
     finally:
         if ok:
             _release_lock(csv_path)
@@ -598,14 +844,22 @@ Would you like to log a manual trade? Enter 'b' for buy, 's' for sell, or press
     # ------- Daily pricing + stop-loss execution -------
     s, e = trading_day_window()
     logger.info("Pricing portfolio for window %s to %s", s.date(), e.date())
-    for _, stock in portfolio_df.iterrows():
-        ticker = str(stock["ticker"]).upper()
-        shares = int(stock["shares"]) if not pd.isna(stock["shares"]) else 0
-        cost = float(stock["buy_price"]) if not pd.isna(stock["buy_price"]) else 0.0
-        cost_basis = float(stock["cost_basis"]) if not pd.isna(stock["cost_basis"]) else cost * shares
-        stop = float(stock["stop_loss"]) if not pd.isna(stock["stop_loss"]) else 0.0
-
-        fetch = download_price_data(ticker, start=s, end=e, auto_adjust=False, progress=False)
+    # Normalize the holding columns once up front instead of probing each row
+    holdings = portfolio_df.reindex(columns=["ticker", "shares", "buy_price", "cost_basis", "stop_loss"])
+    tickers_col = holdings["ticker"].astype(str).str.upper().tolist()
+    shares_col = pd.to_numeric(holdings["shares"], errors="coerce").fillna(0).astype(int).tolist()
+    cost_col = pd.to_numeric(holdings["buy_price"], errors="coerce").fillna(0.0).astype(float)
+    basis_col = pd.to_numeric(holdings["cost_basis"], errors="coerce").astype(float)
+    basis_col = basis_col.fillna(cost_col * pd.Series(shares_col, index=basis_col.index, dtype=float))
+    stop_col = pd.to_numeric(holdings["stop_loss"], errors="coerce").fillna(0.0).astype(float).tolist()
+    # Today's bars for every holding in one multi-ticker request; per-ticker fallback only for misses
+    bars = download_price_batch(tickers_col, start=s, end=e, auto_adjust=False, progress=False)
+    for ticker, shares, cost, cost_basis, stop in zip(
+        tickers_col, shares_col, cost_col.tolist(), basis_col.tolist(), stop_col
+    ):
+        fetch = bars.get(ticker)
+        if fetch is None:
+            fetch = download_price_data(ticker, start=s, end=e, auto_adjust=False, progress=False)
         data = fetch.df
 
         if data.empty:
@@ -666,16 +920,11 @@ Would you like to log a manual trade? Enter 'b' for buy, 's' for sell, or press
     results.append(total_row)
 
     df_out = pd.DataFrame(results)
-    # Idempotent per day: drop any existing rows for today before write
-    if PORTFOLIO_CSV.exists():
-        try:
-            existing = pd.read_csv(PORTFOLIO_CSV)
-            existing = existing[existing["Date"] != str(today_iso)]
-            df_out = pd.concat([existing, df_out], ignore_index=True)
-        except Exception:
-            pass
+    # Idempotent per day: today's rows replace any existing ones, in a single read/merge under the lock
     logger.info("Saving results to CSV (%s rows)", len(df_out))
-    _write_csv_idempotent(PORTFOLIO_CSV, df_out, subset_cols=["Date", "Ticker", "Action", "Shares"])
+    _write_csv_idempotent(
+        PORTFOLIO_CSV, df_out, subset_cols=["Date", "Ticker", "Action", "Shares"], replace_date=str(today_iso)
+    )
 
     return portfolio_df, cash
 
@@ -919,10 +1168,9 @@ def _load_autotrade_config(base_dir: Path | None = None) -> dict[str, object]:
     cfg_path = (Path(base_dir) if base_dir else SCRIPT_DIR) / "autotrade.json"
     try:
         if cfg_path.exists():
-            with cfg_path.open("r", encoding="utf-8") as fh:
-                data = json.load(fh)
-                if isinstance(data, dict):
-                    return {**_default_autotrade_config(), **data}
+            data = _json_loads(cfg_path.read_bytes())
+            if isinstance(data, dict):
+                return {**_default_autotrade_config(), **data}
     except Exception:
         pass
     return _default_autotrade_config()
@@ -930,11 +1178,16 @@ def _load_autotrade_config(base_dir: Path | None = None) -> dict[str, object]:
 def _save_autotrade_config(cfg: dict[str, object], base_dir: Path | None = None) -> None:
     cfg_path = (Path(base_dir) if base_dir else SCRIPT_DIR) / "autotrade.json"
     try:
-        with cfg_path.open("w", encoding="utf-8") as fh:
-            json.dump(cfg, fh, indent=2)
+        _json_write(cfg_path, cfg)
     except Exception:
         pass
 
+def _held_tickers(portfolio_df: pd.DataFrame) -> set[str]:
+    """Upper-cased tickers currently held, built with one vectorized str.upper pass."""
+    if "ticker" not in portfolio_df.columns:
+        return set()
+    return set(portfolio_df["ticker"].astype(str).str.upper())
+
 def auto_trade_once(
     portfolio: pd.DataFrame | dict[str, list[object]] | list[dict[str, object]],
     cash: float,
@@ -961,7 +1214,7 @@ def auto_trade_once(
     portfolio_df = portfolio_df.copy()
 
     # Current unique positions (by ticker)
-    held = set(str(t).upper() for t in portfolio_df.get("ticker", pd.Series(dtype=str)).astype(str))
+    held = _held_tickers(portfolio_df)
 
     executed: list[dict[str, object]] = []
 
@@ -969,15 +1222,21 @@ def auto_trade_once(
     sell_rule = str(cfg.get("sell_rule", "close_lt_sma50")).lower()
     take_profit_pct = float(cfg.get("take_profit_pct", 0.15))
 
+    # ~60 trading days of history for the 50-day SMA
+    end_d = last_trading_date()
+    start_d = end_d - pd.Timedelta(days=80)
+
     if not portfolio_df.empty and len(held) > 0:
         to_iter = list(held)
+        # One multi-ticker request for every holding; per-ticker fetch only for what it missed
+        histories = download_price_batch(to_iter, start=start_d, end=(end_d + pd.Timedelta(days=1)), progress=False)
         for ticker in to_iter:
             if not ticker:
                 continue
             try:
-                end_d = last_trading_date()
-                start_d = end_d - pd.Timedelta(days=80)
-                fetchp = download_price_data(ticker, start=start_d, end=(end_d + pd.Timedelta(days=1)), progress=False)
+                fetchp = histories.get(ticker)
+                if fetchp is None:
+                    fetchp = download_price_data(ticker, start=start_d, end=(end_d + pd.Timedelta(days=1)), progress=False)
                 dfp = fetchp.df
                 if dfp.empty or len(dfp) < 50:
                     continue
@@ -1016,24 +1275,26 @@ def auto_trade_once(
                 continue
 
     # Recompute held after sells, then compute remaining slots
-    held = set(str(t).upper() for t in portfolio_df.get("ticker", pd.Series(dtype=str)).astype(str))
-    num_positions = len([t for t in held if t])
+    held = _held_tickers(portfolio_df)
+    num_positions = len(held - {""})
     remaining_slots = max(0, max_positions - num_positions)
     if remaining_slots <= 0 or cash <= 0 or not universe:
         return portfolio_df, cash, executed
 
-    # Evaluate each candidate
-    for ticker in universe:
+    # Evaluate each candidate: one batched request up front, then a lazy per-ticker fetch only for
+    # candidates the batch missed, so the early break still skips the remaining fallbacks
+    candidates = [t for t in universe if t not in held]
+    histories = download_price_batch(candidates, start=start_d, end=(end_d + pd.Timedelta(days=1)), progress=False)
+    buy_logs: list[dict[str, object]] = []
+    new_positions: list[dict[str, object]] = []
+    for ticker in candidates:
         if remaining_slots <= 0 or cash <= 0:
             break
-        if ticker in held:
-            continue
 
         try:
-            # Use last 60 trading days
-            end_d = last_trading_date()
-            start_d = end_d - pd.Timedelta(days=80)
-            fetch = download_price_data(ticker, start=start_d, end=(end_d + pd.Timedelta(days=1)), progress=False)
+            fetch = histories.get(ticker)
+            if fetch is None:
+                fetch = download_price_data(ticker, start=start_d, end=(end_d + pd.Timedelta(days=1)), progress=False)
             df = fetch.df
             if df.empty or len(df) < 50:
                 continue
@@ -1073,19 +1334,7 @@ def auto_trade_once(
                 "PnL": 0.0,
                 "Reason": "AUTO BUY - close>50dSMA",
             }
-            if TRADE_LOG_CSV.exists():
-                df_log = pd.read_csv(TRADE_LOG_CSV)
-                if df_log.empty:
-                    df_log = pd.DataFrame([log])
-                else:
-                    df_log = pd.concat([df_log, pd.DataFrame([log])], ignore_index=True)
-            else:
-                df_log = pd.DataFrame([log])
-            _write_csv_idempotent(
-                TRADE_LOG_CSV,
-                df_log if isinstance(df_log, pd.DataFrame) else pd.DataFrame([log]),
-                subset_cols=["Date", "Ticker", "Shares Bought", "Buy Price", "Reason"],
-            )
+            buy_logs.append(log)
             logger.info("AUTO BUY %s %s@%s (stop %.2f)", ticker, shares, exec_price, stop_loss)
 
             # Update portfolio frame
@@ -1096,10 +1345,7 @@ def auto_trade_once(
                 "buy_price": float(exec_price),
                 "cost_basis": float(notional),
             }
-            if portfolio_df.empty:
-                portfolio_df = pd.DataFrame([new_pos])
-            else:
-                portfolio_df = pd.concat([portfolio_df, pd.DataFrame([new_pos])], ignore_index=True)
+            new_positions.append(new_pos)
 
             cash -= notional
             remaining_slots -= 1
@@ -1108,6 +1354,19 @@ def auto_trade_once(
         except Exception:
             continue
 
+    # Persist all buys in one pass: a single trade-log merge/replace and one frame concat
+    if buy_logs:
+        _write_csv_idempotent(
+            TRADE_LOG_CSV,
+            pd.DataFrame(buy_logs),
+            subset_cols=["Date", "Ticker", "Shares Bought", "Buy Price", "Reason"],
+        )
+    if new_positions:
+        if portfolio_df.empty:
+            portfolio_df = pd.DataFrame(new_positions)
+        else:
+            portfolio_df = pd.concat([portfolio_df, pd.DataFrame(new_positions)], ignore_index=True)
+
     return portfolio_df, cash, executed
 
 
@@ -1115,8 +1374,48 @@ def auto_trade_once(
 # Reporting / Metrics
 # ------------------------------
 
-def daily_results(chatgpt_portfolio: pd.DataFrame, cash: float) -> None:
-    """Print daily price updates and performance metrics (incl. CAPM)."""
+RF_ANNUAL = 0.045  # risk-free rate used for Sharpe/Sortino
+
+def _equity_metrics(equity_series: pd.Series) -> dict[str, float]:
+    """Headline metrics from a date-sorted Total Equity series.
+
+    Returns daily_pnl (last day's equity change), max_drawdown and an annualized
+    Sharpe ratio; each is 0.0 when there is not enough history.
+    """
+    metrics = {"daily_pnl": 0.0, "max_drawdown": 0.0, "sharpe_ratio": 0.0}
+    equity = equity_series.astype(float)
+    if equity.empty:
+        return metrics
+    metrics["max_drawdown"] = float(((equity / equity.cummax()) - 1.0).min())
+    if len(equity) >= 2:
+        metrics["daily_pnl"] = float(equity.iloc[-1] - equity.iloc[-2])
+    r = equity.pct_change().dropna()
+    if len(r) >= 2:
+        rf_daily = (1 + RF_ANNUAL) ** (1 / 252) - 1
+        std_daily = float(r.std(ddof=1))
+        if std_daily > 0:
+            metrics["sharpe_ratio"] = float(((float(r.mean()) - rf_daily) / std_daily) * np.sqrt(252))
+    return metrics
+
+def performance_metrics(portfolio_csv: Path | None = None) -> dict[str, float]:
+    """Return daily_pnl, max_drawdown and sharpe_ratio from the portfolio CSV history.
+
+    Unlike daily_results(), this prints nothing and downloads no prices.
+    """
+    path = Path(portfolio_csv) if portfolio_csv else PORTFOLIO_CSV
+    try:
+        df = pd.read_csv(path, usecols=["Date", "Ticker", "Total Equity"])
+    except Exception:
+        return _equity_metrics(pd.Series(dtype=float))
+    totals = df[df["Ticker"] == "TOTAL"].copy()
+    totals["Date"] = pd.to_datetime(totals["Date"])
+    return _equity_metrics(totals.sort_values("Date").set_index("Date")["Total Equity"])
+
+def daily_results(chatgpt_portfolio: pd.DataFrame, cash: float) -> dict[str, float]:
+    """Print daily price updates and performance metrics (incl. CAPM).
+
+    Returns the headline metrics (see performance_metrics()) so callers don't have to scrape stdout.
+    """
     portfolio_dict: list[dict[Any, Any]] = chatgpt_portfolio.to_dict(orient="records")
     today = check_weekend()
 
@@ -1145,10 +1444,10 @@ def daily_results(chatgpt_portfolio: pd.DataFrame, cash: float) -> None:
             percent_change = ((price - last_price) / last_price) * 100
             rows.append([ticker, f"{price:,.2f}", f"{percent_change:+.2f}%", f"{int(volume):,}"])
         except Exception as e:
-            raise Exception(f"Download for {ticker} failed. {e} Try checking internet connection.")
+            raise Exception(f"Download for {ticker} failed. {e} Try checking internet connection.") from e
 
-    # Read portfolio history
-    chatgpt_df = pd.read_csv(PORTFOLIO_CSV)
+    # Read portfolio history (only the columns the TOTAL-row equity curve needs)
+    chatgpt_df = pd.read_csv(PORTFOLIO_CSV, engine="c", usecols=["Date", "Ticker", "Total Equity"])
 
     # Use only TOTAL rows, sorted by date
     totals = chatgpt_df[chatgpt_df["Ticker"] == "TOTAL"].copy()
@@ -1187,7 +1486,7 @@ def daily_results(chatgpt_portfolio: pd.DataFrame, cash: float) -> None:
             "\n"
             "*Paste everything above into ChatGPT*"
         )
-        return
+        return _equity_metrics(pd.Series(dtype=float))
 
     totals["Date"] = pd.to_datetime(totals["Date"])  # tolerate ISO strings
     totals = totals.sort_values("Date")
@@ -1239,10 +1538,10 @@ def daily_results(chatgpt_portfolio: pd.DataFrame, cash: float) -> None:
             "\n"
             "*Paste everything above into ChatGPT*"
         )
-        return
+        return _equity_metrics(equity_series)
 
     # Risk-free config
-    rf_annual = 0.045
+    rf_annual = RF_ANNUAL
     rf_daily = (1 + rf_annual) ** (1 / 252) - 1
     rf_period = (1 + rf_daily) ** n_days - 1
 
@@ -1382,17 +1681,21 @@ def daily_results(chatgpt_portfolio: pd.DataFrame, cash: float) -> None:
         "\n"
         "*Paste everything above into ChatGPT*"
     )
+    return _equity_metrics(equity_series)
 
 
 # ------------------------------
 # Orchestration
 # ------------------------------
 
+_STATE_UNUSED_COLS = frozenset({"Current Price", "PnL", "Total Value", "Total Equity"})
+
 def load_latest_portfolio_state(
     file: str,
 ) -> tuple[pd.DataFrame | list[dict[str, Any]], float]:
     """Load the most recent portfolio snapshot and cash balance."""
-    df = pd.read_csv(file)
+    # Skip per-day valuation columns we drop anyway; pin Ticker so pandas needn't infer it
+    df = pd.read_csv(file, engine="c", usecols=lambda c: c not in _STATE_UNUSED_COLS, dtype={"Ticker": str})
     if df.empty:
         portfolio = pd.DataFrame(columns=["ticker", "shares", "stop_loss", "buy_price", "cost_basis"])
         # Fully automated: use env STARTING_CASH or default to 10000.0
@@ -1404,14 +1707,15 @@ def load_latest_portfolio_state(
         print(f"Portfolio CSV is empty. Using starting cash ${cash:,.2f} (override with STARTING_CASH).")
         return portfolio, cash
 
-    non_total = df[df["Ticker"] != "TOTAL"].copy()
-    non_total["Date"] = pd.to_datetime(non_total["Date"])
+    # Split holdings/TOTAL rows with one mask and parse Date once for both halves
+    is_total = (df["Ticker"] == "TOTAL").to_numpy()
+    dates = pd.to_datetime(df["Date"])
 
-    latest_date = non_total["Date"].max()
-    latest_tickers = non_total[non_total["Date"] == latest_date].copy()
-    sold_mask = latest_tickers["Action"].astype(str).str.startswith("SELL")
-    latest_tickers = latest_tickers[~sold_mask].copy()
-    latest_tickers.drop(
+    holding_dates = dates[~is_total]
+    latest_date = holding_dates.max()
+    latest_rows = df[~is_total]
+    keep = (holding_dates == latest_date) & ~latest_rows["Action"].astype(str).str.startswith("SELL")
+    latest_tickers = latest_rows[keep].drop(
         columns=[
             "Date",
             "Cash Balance",
@@ -1421,10 +1725,8 @@ def load_latest_portfolio_state(
             "PnL",
             "Total Value",
         ],
-        inplace=True,
         errors="ignore",
-    )
-    latest_tickers.rename(
+    ).rename(
         columns={
             "Cost Basis": "cost_basis",
             "Buy Price": "buy_price",
@@ -1432,14 +1734,13 @@ def load_latest_portfolio_state(
             "Ticker": "ticker",
             "Stop Loss": "stop_loss",
         },
-        inplace=True,
     )
     latest_tickers = latest_tickers.reset_index(drop=True).to_dict(orient="records")
 
-    df_total = df[df["Ticker"] == "TOTAL"].copy()
-    df_total["Date"] = pd.to_datetime(df_total["Date"])
-    latest = df_total.sort_values("Date").iloc[-1]
-    cash = float(latest["Cash Balance"])
+    # Cash comes from the last TOTAL row on the most recent date
+    total_dates = dates[is_total]
+    latest_total = total_dates.index[total_dates == total_dates.max()][-1]
+    cash = float(df.at[latest_total, "Cash Balance"])
     return latest_tickers, cash
 
 